@@ -12,15 +12,16 @@ DATA_FETCH_INTERVAL_SECONDS = 60  # Interval between price fetches
 NSE_BASE_URL = "https://www.nseindia.com"
 NSE_NIFTY50_API = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
 NSE_QUOTE_API = "https://www.nseindia.com/api/quote-equity?symbol={symbol}"
+NSE_MARKET_PAGE = "https://www.nseindia.com/market-data/live-equity-market"  # Visited before API calls and sent as Referer
 
-# HTTP Headers
+# HTTP Headers (nse_client drops 'br' from Accept-Encoding if no Brotli decoder is installed)
 HTTP_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
     'Accept': 'application/json, text/plain, */*',
     'Accept-Language': 'en-US,en;q=0.9',
     'Accept-Encoding': 'gzip, deflate, br',
     'Connection': 'keep-alive',
-    'Referer': 'https://www.nseindia.com/market-data/live-equity-market'
+    'Referer': NSE_MARKET_PAGE
 }
 
 # File Paths
@@ -28,6 +29,12 @@ NIFTY50_JSON_FILE = 'nifty50_stocks.json'
 NIFTY50_CSV_FILE = 'nifty50_stocks.csv'
 RESULTS_JSON_FILE = 'momentum_analysis_results.json'
 RESULTS_CSV_FILE = 'momentum_analysis_results.csv'
+SHIFTS_LOG_FILE = 'momentum_shifts.jsonl'  # Append-only log of every detected shift
+
+# Response Cache (scraper only; live prices are never cached)
+NSE_CACHE_NAME = '.nse_cache'  # SQLite cache file, created as .nse_cache.sqlite
+CONSTITUENTS_CACHE_SECONDS = 86400  # Index constituents only change at rebalances
+QUOTE_CACHE_SECONDS = 60
 
 # Analysis Settings
 TOP_N_STOCKS = 5  # Number of top stocks to display in results
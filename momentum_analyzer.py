@@ -3,87 +3,195 @@ Intraday Momentum Analyzer
 Fetches live intraday price data and identifies momentum shifts for NIFTY 50 stocks
 """
 
-import requests
-import pandas as pd
+import asyncio
+import importlib.util
 import numpy as np
-import json
+import numba
+import csv
+import orjson
 import time
 from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from collections import deque
 import logging
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Dict, List, Optional, Tuple
 import os
 
+from config import (NSE_BASE_URL, NSE_NIFTY50_API, RECENT_SHIFTS_COUNT,
+                    TOP_N_STOCKS, SHIFTS_LOG_FILE, MOMENTUM_WINDOW_MINUTES)
+from nse_client import HEADERS, NON_STOCK_SYMBOLS, build_session, fetch_quotes, quote_url, warmup
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Initial number of rows in the momentum shift log
+SHIFT_LOG_CAPACITY = 4096
+
+# Shift direction codes stored in the shift log
+SHIFT_TYPES = {1: 'Upward', -1: 'Downward'}
+
+# Relative gap between LTP and MA below which the two count as equal (i.e. not above the MA),
+# so rounding drift in the running sum between re-sums cannot turn an exact tie into a cross
+MA_TIE_TOLERANCE = 1e-9
+
+# Separator line for the per-iteration log header
+_BANNER = '=' * 60
+
+
+@numba.njit(cache=True, fastmath=True)
+def _tick_update(ltp, fetched, ring, head, count, rolling_sum, prev_above, prev_valid, ma_period,
+                 up_idx, down_idx):
+    """
+    Update the ring buffers and running sums with one price snapshot and detect MA crosses
+    Returns: (number of upward crosses, number of downward crosses) written to up_idx/down_idx
+    """
+    history_length = ring.shape[1]
+    n_up = 0
+    n_down = 0
+    
+    for i in range(ltp.shape[0]):
+        if not fetched[i]:
+            continue
+        
+        # Drop the price that falls out of the MA window, then append the new one
+        h = head[i]
+        if count[i] >= ma_period:
+            rolling_sum[i] -= ring[i, (h - ma_period + history_length) % history_length]
+        ring[i, h] = ltp[i]
+        rolling_sum[i] += ltp[i]
+        h = (h + 1) % history_length
+        head[i] = h
+        if count[i] < history_length:
+            count[i] += 1
+        
+        # Once a row wraps, its MA window is the contiguous tail of the row: re-sum it
+        # exactly so floating-point drift in the running sum cannot accumulate
+        if h == 0:
+            total = 0.0
+            for k in range(history_length - ma_period, history_length):
+                total += ring[i, k]
+            rolling_sum[i] = total
+        
+        # Only stocks with a full MA window take part
+        if count[i] < ma_period:
+            continue
+        
+        ma = rolling_sum[i] / ma_period
+        above = ltp[i] - ma > MA_TIE_TOLERANCE * ma
+        
+        # A cross needs a previous position to compare against
+        if prev_valid[i]:
+            if above and not prev_above[i]:
+                up_idx[n_up] = i
+                n_up += 1
+            elif not above and prev_above[i]:
+                down_idx[n_down] = i
+                n_down += 1
+        
+        prev_above[i] = above
+        prev_valid[i] = True
+    
+    return n_up, n_down
+
 
 class IntradayMomentumAnalyzer:
-    def __init__(self, ma_period: int = 10):
+    __slots__ = (
+        'ma_period', 'use_http2', 'base_url', 'headers', 'session', '_encoding_logged', 'stocks',
+        'history_length', '_symbol_idx', '_symbols', '_prices', '_head', '_count', '_rolling_sum',
+        '_last_update', '_prev_above', '_prev_valid', '_up_idx', '_down_idx',
+        '_shifts', '_n_shifts', '_total_shifts', '_shift_log', '_recent_shifts'
+    )
+    
+    def __init__(self, ma_period: int = 10, use_http2: bool = False):
         """
         Initialize momentum analyzer
         Args:
             ma_period: Number of data points for moving average calculation
+            use_http2: Multiplex per-symbol quote requests over HTTP/2 (requires httpx[http2])
         """
+        # Checked up front: the quote fetcher imports httpx lazily, and httpx only imports h2 once an HTTP/2 client is created
+        if use_http2 and (importlib.util.find_spec('httpx') is None or importlib.util.find_spec('h2') is None):
+            raise ImportError("use_http2=True requires httpx with HTTP/2 support: pip install 'httpx[http2]'")
+        
         self.ma_period = ma_period
-        self.base_url = "https://www.nseindia.com"
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Connection': 'keep-alive',
-            'Referer': 'https://www.nseindia.com/market-data/live-equity-market'
+        self.use_http2 = use_http2
+        self.base_url = NSE_BASE_URL
+        self.headers = HEADERS
+        
+        # Uncached: every tick must see live prices
+        self.session = build_session()
+        self._encoding_logged = False
+        
+        # Price history as a preallocated ring buffer: one row per stock, indexed via _symbol_idx
+        self.history_length = max(60, ma_period)
+        self._symbol_idx: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._prices = np.zeros((0, self.history_length), dtype=np.float64)
+        self._head = np.zeros(0, dtype=np.int64)
+        self._count = np.zeros(0, dtype=np.int64)
+        
+        # Running sum of the last ma_period prices per stock, updated on every append
+        self._rolling_sum = np.zeros(0, dtype=np.float64)
+        
+        # NSE's lastUpdateTime of the last price pushed per stock, so a snapshot NSE repeats is not pushed twice
+        self._last_update: List[Optional[str]] = []
+        
+        # Momentum shifts as columns over a shared row index, grown by doubling
+        self._shifts = {
+            'sym': np.empty(SHIFT_LOG_CAPACITY, dtype=np.int32),
+            'ts': np.empty(SHIFT_LOG_CAPACITY, dtype=np.float64),
+            'price': np.empty(SHIFT_LOG_CAPACITY, dtype=np.float64),
+            'ma': np.empty(SHIFT_LOG_CAPACITY, dtype=np.float64),
+            'dir': np.empty(SHIFT_LOG_CAPACITY, dtype=np.int8)
         }
-        self.session = requests.Session()
+        self._n_shifts = 0
+        self._total_shifts = 0
+        
+        # Append-only JSONL log of shifts, open while run_analysis is running
+        self._shift_log = None
         
-        # Store price history for each stock: {symbol: deque of (timestamp, price)}
-        self.price_history = defaultdict(lambda: deque(maxlen=60))
+        # Most recent shifts across all stocks, for the per-iteration status log
+        self._recent_shifts = deque(maxlen=RECENT_SHIFTS_COUNT)
         
-        # Store momentum shifts: {symbol: list of shifts}
-        self.momentum_shifts = defaultdict(list)
+        # Previous position relative to MA, and whether that position has been observed yet
+        self._prev_above = np.zeros(0, dtype=bool)
+        self._prev_valid = np.zeros(0, dtype=bool)
         
-        # Store previous MA cross status
-        self.prev_cross_status = {}
+        # Preallocated outputs for the rows that crossed on the current tick
+        self._up_idx = np.empty(0, dtype=np.int64)
+        self._down_idx = np.empty(0, dtype=np.int64)
         
         self.stocks = []
         
-    def _init_session(self):
-        """Initialize session with NSE"""
-        try:
-            self.session.get(self.base_url, headers=self.headers, timeout=10)
-            time.sleep(1)
-            return True
-        except Exception as e:
-            logger.error(f"Session initialization failed: {e}")
-            return False
-    
     def load_nifty50_stocks(self, filename: str = 'nifty50_stocks.json') -> bool:
         """Load NIFTY 50 stocks from JSON file"""
         try:
             if not os.path.exists(filename):
-                logger.error(f"File {filename} not found. Run scrape_nifty50.py first.")
+                logger.error("File %s not found. Run scrape_nifty50.py first.", filename)
                 return False
             
-            with open(filename, 'r') as f:
-                self.stocks = json.load(f)
+            with open(filename, 'rb') as f:
+                self.stocks = orjson.loads(f.read())
+            
+            self._register_symbols([stock['symbol'] for stock in self.stocks])
             
-            logger.info(f"Loaded {len(self.stocks)} NIFTY 50 stocks")
+            logger.info("Loaded %d NIFTY 50 stocks", len(self.stocks))
             return True
         except Exception as e:
-            logger.error(f"Error loading stocks: {e}")
+            logger.error("Error loading stocks: %s", e)
             return False
     
     def fetch_live_price(self, symbol: str) -> Tuple[float, float, datetime]:
         """
         Fetch live price for a single stock
+        Fallback only: the analysis loop uses the batched fetch_all_live_prices()
         Returns: (ltp, volume, timestamp)
         """
         try:
-            url = f"https://www.nseindia.com/api/quote-equity?symbol={symbol}"
-            response = self.session.get(url, headers=self.headers, timeout=10)
+            response = self.session.get(quote_url(symbol), headers=self.headers, timeout=10)
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 price_info = data.get('priceInfo', {})
                 ltp = price_info.get('lastPrice', 0)
                 volume = data.get('preOpenMarket', {}).get('totalTradedVolume', 0)
@@ -93,7 +201,7 @@ class IntradayMomentumAnalyzer:
                 return None, None, None
                 
         except Exception as e:
-            logger.debug(f"Error fetching price for {symbol}: {e}")
+            logger.debug("Error fetching price for %s: %s", symbol, e)
             return None, None, None
     
     def fetch_all_live_prices(self) -> Dict:
@@ -101,106 +209,253 @@ class IntradayMomentumAnalyzer:
         prices = {}
         
         try:
-            url = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
-            response = self.session.get(url, headers=self.headers, timeout=15)
+            response = self.session.get(NSE_NIFTY50_API, headers=self.headers, timeout=15)
             
             if response.status_code == 200:
-                data = response.json()
-                timestamp = datetime.now()
+                if not self._encoding_logged:
+                    logger.info("NSE response Content-Encoding: %s", response.headers.get('Content-Encoding', 'identity'))
+                    self._encoding_logged = True
+                
+                data = orjson.loads(response.content)
+                timestamp = time.time()
                 
                 if 'data' in data:
                     for stock in data['data']:
                         symbol = stock.get('symbol')
-                        if symbol and symbol != 'NIFTY 50':
+                        if symbol and symbol not in NON_STOCK_SYMBOLS:
                             prices[symbol] = {
                                 'ltp': stock.get('lastPrice', 0),
                                 'volume': stock.get('totalTradedVolume', 0),
-                                'timestamp': timestamp
+                                'timestamp': timestamp,
+                                'updated': stock.get('lastUpdateTime')
                             }
                 
-                logger.info(f"Fetched prices for {len(prices)} stocks")
+                logger.info("Fetched prices for %d stocks", len(prices))
             
         except Exception as e:
-            logger.error(f"Error fetching live prices: {e}")
+            logger.error("Error fetching live prices: %s", e)
+        
+        return prices
+    
+    async def fetch_all_quotes_async(self, symbols: List[str] = None) -> Dict:
+        """
+        Fetch per-symbol quotes concurrently
+        Args:
+            symbols: Symbols to fetch, defaults to all loaded stocks
+        """
+        if symbols is None:
+            symbols = [stock['symbol'] for stock in self.stocks]
+        
+        timestamp = time.time()
+        quotes = await fetch_quotes(self.session, symbols, self.headers, http2=self.use_http2)
+        
+        prices = {}
+        for symbol, data in quotes.items():
+            # NSE answers blocked or cookie-less requests with 200 and {}: that is no price, not a price of 0
+            ltp = (data.get('priceInfo') or {}).get('lastPrice')
+            if isinstance(ltp, bool) or not isinstance(ltp, (int, float)) or ltp <= 0:
+                continue
+            
+            prices[symbol] = {
+                'ltp': ltp,
+                'volume': data.get('preOpenMarket', {}).get('totalTradedVolume', 0),
+                'timestamp': timestamp,
+                'updated': data.get('metadata', {}).get('lastUpdateTime')
+            }
+        logger.info("Fetched quotes for %d of %d stocks", len(prices), len(symbols))
+        return prices
+    
+    def _fetch_snapshot(self) -> Dict:
+        """Fetch one tick of prices: the batched index call plus per-symbol quotes for symbols it missed"""
+        prices = self.fetch_all_live_prices()
+        missing = [stock['symbol'] for stock in self.stocks if stock['symbol'] not in prices]
+        if missing:
+            prices.update(asyncio.run(self.fetch_all_quotes_async(missing)))
         
         return prices
     
+    def _register_symbols(self, symbols: List[str]):
+        """Assign ring buffer rows to symbols that have not been seen yet"""
+        new_symbols = [s for s in symbols if s not in self._symbol_idx]
+        if not new_symbols:
+            return
+        
+        for symbol in new_symbols:
+            self._symbol_idx[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+        
+        extra = len(new_symbols)
+        self._prices = np.vstack([self._prices, np.zeros((extra, self.history_length))])
+        self._head = np.concatenate([self._head, np.zeros(extra, dtype=np.int64)])
+        self._count = np.concatenate([self._count, np.zeros(extra, dtype=np.int64)])
+        self._rolling_sum = np.concatenate([self._rolling_sum, np.zeros(extra)])
+        self._last_update.extend([None] * extra)
+        self._prev_above = np.concatenate([self._prev_above, np.zeros(extra, dtype=bool)])
+        self._prev_valid = np.concatenate([self._prev_valid, np.zeros(extra, dtype=bool)])
+        self._up_idx = np.empty(len(self._symbols), dtype=np.int64)
+        self._down_idx = np.empty(len(self._symbols), dtype=np.int64)
+    
+    def _prices_to_array(self, prices: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lay out a fetched {symbol: price_data} snapshot along the ring buffer rows
+        Returns: (ltp array, mask of rows present in the snapshot with a positive price)
+        """
+        self._register_symbols(list(prices))
+        
+        ltp = np.zeros(len(self._symbols), dtype=np.float64)
+        fetched = np.zeros(len(self._symbols), dtype=bool)
+        for symbol, price_data in prices.items():
+            i = self._symbol_idx[symbol]
+            ltp[i] = price_data['ltp']
+            
+            # A missing lastPrice defaults to 0; such rows must stay out of the MA window and the report
+            fetched[i] = ltp[i] > 0
+        
+        return ltp, fetched
+    
+    def _updated_rows(self, prices: Dict) -> np.ndarray:
+        """
+        Mask of rows with a positive price whose NSE lastUpdateTime changed since their last pushed price
+        A flat price with a new update time is still a data point; only a repeated snapshot is skipped
+        """
+        updated = np.zeros(len(self._symbols), dtype=bool)
+        for symbol, price_data in prices.items():
+            # A quote of 0 is never pushed, even without an update time to compare
+            if not price_data['ltp'] > 0:
+                continue
+            
+            i = self._symbol_idx[symbol]
+            stamp = price_data.get('updated')
+            if stamp is None or stamp != self._last_update[i]:
+                updated[i] = True
+                self._last_update[i] = stamp
+        
+        return updated
+    
     def calculate_moving_average(self, symbol: str) -> float:
         """Calculate moving average for a stock"""
-        if len(self.price_history[symbol]) < self.ma_period:
+        i = self._symbol_idx.get(symbol)
+        if i is None or self._count[i] < self.ma_period:
             return None
         
-        prices = [price for _, price in list(self.price_history[symbol])[-self.ma_period:]]
-        return np.mean(prices)
+        return self._rolling_sum[i] / self.ma_period
     
-    def detect_momentum_shift(self, symbol: str, current_ltp: float, timestamp: datetime):
+    def process_tick(self, ltp: np.ndarray, fetched: np.ndarray, timestamp: float):
         """
-        Detect if there's a momentum shift (LTP crossing MA)
+        Push a price snapshot into the ring buffers and record momentum shifts (LTP crossing MA)
+        Args:
+            timestamp: Snapshot time as epoch seconds
         """
-        ma = self.calculate_moving_average(symbol)
+        n_up, n_down = _tick_update(ltp, fetched, self._prices, self._head, self._count, self._rolling_sum,
+                                    self._prev_above, self._prev_valid, self.ma_period,
+                                    self._up_idx, self._down_idx)
         
-        if ma is None:
-            return
-        
-        # Determine current position relative to MA
-        current_above_ma = current_ltp > ma
+        for i in self._up_idx[:n_up]:
+            self._record_shift(i, 1, ltp[i], self._rolling_sum[i] / self.ma_period, timestamp)
         
-        # Check if we have previous status
-        if symbol in self.prev_cross_status:
-            prev_above_ma = self.prev_cross_status[symbol]['above_ma']
-            
-            # Detect cross
-            if current_above_ma and not prev_above_ma:
-                # Upward cross
-                self.momentum_shifts[symbol].append({
-                    'timestamp': timestamp,
-                    'shift_type': 'Upward',
-                    'price_at_cross': current_ltp,
-                    'ma_at_cross': ma
-                })
-                logger.info(f"{symbol}: Upward momentum shift detected at {current_ltp}")
-                
-            elif not current_above_ma and prev_above_ma:
-                # Downward cross
-                self.momentum_shifts[symbol].append({
-                    'timestamp': timestamp,
-                    'shift_type': 'Downward',
-                    'price_at_cross': current_ltp,
-                    'ma_at_cross': ma
-                })
-                logger.info(f"{symbol}: Downward momentum shift detected at {current_ltp}")
-        
-        # Update previous status
-        self.prev_cross_status[symbol] = {
-            'above_ma': current_above_ma,
-            'timestamp': timestamp
-        }
+        for i in self._down_idx[:n_down]:
+            self._record_shift(i, -1, ltp[i], self._rolling_sum[i] / self.ma_period, timestamp)
     
-    def calculate_percentage_change(self, symbol: str, current_ltp: float) -> List[Dict]:
+    def _record_shift(self, i: int, direction: int, price: float, ma: float, timestamp: float):
+        """Store a detected momentum shift for the stock in ring buffer row i"""
+        # When full, drop shifts that have aged out of the momentum window before growing
+        if self._n_shifts == len(self._shifts['ts']):
+            self._evict_stale_shifts(timestamp)
+        if self._n_shifts == len(self._shifts['ts']):
+            for key, column in self._shifts.items():
+                self._shifts[key] = np.concatenate([column, np.empty_like(column)])
+        
+        k = self._n_shifts
+        self._shifts['sym'][k] = i
+        self._shifts['ts'][k] = timestamp
+        self._shifts['price'][k] = price
+        self._shifts['ma'][k] = ma
+        self._shifts['dir'][k] = direction
+        self._n_shifts += 1
+        self._total_shifts += 1
+        
+        symbol = self._symbols[i]
+        shift_type = SHIFT_TYPES[direction]
+        
+        if self._shift_log is not None:
+            self._shift_log.write(orjson.dumps({
+                'symbol': symbol,
+                'timestamp': timestamp,
+                'shift_type': shift_type,
+                'price_at_cross': float(price),
+                'ma_at_cross': float(ma)
+            }) + b'\n')
+            self._shift_log.flush()
+        
+        self._recent_shifts.append({
+            'symbol': symbol,
+            'type': shift_type,
+            'time': time.strftime('%H:%M:%S', time.localtime(timestamp))
+        })
+        logger.info("%s: %s momentum shift detected at %s", symbol, shift_type, price)
+    
+    def _evict_stale_shifts(self, now: float):
+        """Compact the shift log down to the shifts still inside the momentum window"""
+        n = self._n_shifts
+        
+        # Shifts are logged in time order, so the stale ones form a prefix
+        start = np.searchsorted(self._shifts['ts'][:n], now - MOMENTUM_WINDOW_MINUTES * 60, side='left')
+        if start:
+            for column in self._shifts.values():
+                column[:n - start] = column[start:n]
+            self._n_shifts = n - start
+    
+    def calculate_percentage_changes(self, current_ltp: np.ndarray, fetched: np.ndarray,
+                                     now: float) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Calculate percentage change from each momentum shift to current price
+        Calculate percentage change from each recent momentum shift to the current price
+        Args:
+            current_ltp: Current prices along the ring buffer rows
+            fetched: Mask of rows with a current price
+            now: Reference time as epoch seconds, read once by the caller
+        Returns: (shift log rows, pct_change for each of those rows)
         """
-        results = []
+        n = self._n_shifts
+        sym = self._shifts['sym'][:n]
+        time_diff = (now - self._shifts['ts'][:n]) / 60
         
-        for shift in self.momentum_shifts[symbol]:
-            time_diff = (datetime.now() - shift['timestamp']).total_seconds() / 60
-            
-            # Only consider shifts within last 60 minutes
-            if time_diff <= 60:
-                pct_change = ((current_ltp - shift['price_at_cross']) / shift['price_at_cross']) * 100
-                
-                results.append({
-                    'symbol': symbol,
-                    'shift_time': shift['timestamp'],
-                    'shift_type': shift['shift_type'],
-                    'price_at_cross': shift['price_at_cross'],
-                    'current_price': current_ltp,
-                    'pct_change': pct_change,
-                    'abs_pct_change': abs(pct_change),
-                    'time_since_shift_mins': time_diff
-                })
-        
-        return results
+        # Only consider shifts within the momentum window
+        rows = np.flatnonzero((time_diff <= MOMENTUM_WINDOW_MINUTES) & fetched[sym])
+        price_at_cross = self._shifts['price'][rows]
+        pct_change = (current_ltp[sym[rows]] - price_at_cross) / price_at_cross * 100
+        
+        return rows, pct_change
+    
+    def _top_shifts(self, rows: np.ndarray, pct_change: np.ndarray, direction: int,
+                    current_ltp: np.ndarray, now: float) -> List[Dict]:
+        """Build report records for the largest absolute moves in one shift direction"""
+        selected = self._shifts['dir'][rows] == direction
+        rows = rows[selected]
+        pct_change = pct_change[selected]
+        
+        # Partition out the top N by absolute percentage change, then sort only those
+        abs_pct_change = np.abs(pct_change)
+        n = min(TOP_N_STOCKS, abs_pct_change.size)
+        top = np.argpartition(-abs_pct_change, n - 1)[:n] if n else np.arange(0)
+        order = top[np.argsort(-abs_pct_change[top], kind='stable')]
+        
+        records = []
+        for k in order:
+            row = rows[k]
+            i = self._shifts['sym'][row]
+            timestamp = self._shifts['ts'][row]
+            records.append({
+                'symbol': self._symbols[i],
+                'shift_time': datetime.fromtimestamp(timestamp),
+                'shift_type': SHIFT_TYPES[direction],
+                'price_at_cross': float(self._shifts['price'][row]),
+                'current_price': float(current_ltp[i]),
+                'pct_change': float(pct_change[k]),
+                'abs_pct_change': float(abs(pct_change[k])),
+                'time_since_shift_mins': (now - timestamp) / 60
+            })
+        
+        return records
     
     def run_analysis(self, duration_minutes: int = 60, interval_seconds: int = 60):
         """
@@ -213,89 +468,90 @@ class IntradayMomentumAnalyzer:
             logger.error("No stocks loaded. Run load_nifty50_stocks() first.")
             return
         
-        if not self._init_session():
+        if not warmup(self.session, self.headers):
             logger.error("Failed to initialize session")
             return
         
-        logger.info(f"Starting momentum analysis for {duration_minutes} minutes...")
-        logger.info(f"Moving Average Period: {self.ma_period} data points")
-        logger.info(f"Data fetch interval: {interval_seconds} seconds")
+        logger.info("Starting momentum analysis for %s minutes...", duration_minutes)
+        logger.info("Moving Average Period: %d data points", self.ma_period)
+        logger.info("Data fetch interval: %s seconds", interval_seconds)
         
         start_time = datetime.now()
         end_time = start_time + timedelta(minutes=duration_minutes)
         iteration = 0
+        next_tick = time.monotonic()
         
-        while datetime.now() < end_time:
-            iteration += 1
-            logger.info(f"\n{'='*60}")
-            logger.info(f"Iteration {iteration} - {datetime.now().strftime('%H:%M:%S')}")
-            logger.info(f"{'='*60}")
-            
-            # Fetch live prices
-            prices = self.fetch_all_live_prices()
-            
-            # Update price history and detect momentum shifts
-            for symbol, price_data in prices.items():
-                ltp = price_data['ltp']
-                timestamp = price_data['timestamp']
+        # Persist each shift as it is detected rather than only in the final report
+        self._shift_log = open(SHIFTS_LOG_FILE, 'ab')
+        executor = ThreadPoolExecutor(max_workers=1)
+        pending = None
+        try:
+            while datetime.now() < end_time:
+                iteration += 1
+                logger.info("\n%s\nIteration %d - %s\n%s", _BANNER, iteration, time.strftime('%H:%M:%S'), _BANNER)
                 
-                # Add to price history
-                self.price_history[symbol].append((timestamp, ltp))
+                # The worker thread does not overlap fetching with processing: it only lets this tick stop waiting
+                # at its deadline. A fetch that overruns the tick is collected on a later tick
+                if pending is None:
+                    pending = executor.submit(self._fetch_snapshot)
                 
-                # Detect momentum shift
-                self.detect_momentum_shift(symbol, ltp, timestamp)
-            
-            # Display current status
-            self._display_current_status()
-            
-            # Wait for next interval
-            time.sleep(interval_seconds)
+                next_tick += interval_seconds
+                try:
+                    prices = pending.result(timeout=max(0, next_tick - time.monotonic()))
+                except FuturesTimeoutError:
+                    logger.warning("Price fetch did not finish before the next tick, skipping this iteration")
+                    continue
+                except Exception as e:
+                    logger.error("Error fetching prices: %s", e)
+                    prices = {}
+                pending = None
+                
+                # Update price history and detect momentum shifts
+                if prices:
+                    timestamp = next(iter(prices.values()))['timestamp']
+                    ltp, fetched = self._prices_to_array(prices)
+                    
+                    self.process_tick(ltp, fetched & self._updated_rows(prices), timestamp)
+                
+                # Display current status
+                self._display_current_status()
+                
+                # Wait for next interval, counted from the previous deadline so fetch time does not drift the cadence
+                time.sleep(max(0, next_tick - time.monotonic()))
+        finally:
+            executor.shutdown(wait=True)
+            self._shift_log.close()
+            self._shift_log = None
         
         logger.info("\nAnalysis completed!")
         self.generate_final_report()
     
     def _display_current_status(self):
         """Display current momentum shifts"""
-        total_shifts = sum(len(shifts) for shifts in self.momentum_shifts.values())
-        logger.info(f"Total momentum shifts detected: {total_shifts}")
-        
-        if total_shifts > 0:
-            recent_shifts = []
-            for symbol, shifts in self.momentum_shifts.items():
-                for shift in shifts[-3:]:  # Last 3 shifts per stock
-                    recent_shifts.append({
-                        'symbol': symbol,
-                        'type': shift['shift_type'],
-                        'time': shift['timestamp'].strftime('%H:%M:%S')
-                    })
-            
-            if recent_shifts:
-                logger.info("Recent momentum shifts:")
-                for shift in recent_shifts[-5:]:
-                    logger.info(f"  {shift['symbol']}: {shift['type']} at {shift['time']}")
+        logger.info("Total momentum shifts detected: %d", self._total_shifts)
+        
+        # One record for the whole list, and the lines are only built when INFO is enabled
+        if self._recent_shifts and logger.isEnabledFor(logging.INFO):
+            logger.info("Recent momentum shifts:\n%s", '\n'.join(
+                "  %s: %s at %s" % (shift['symbol'], shift['type'], shift['time'])
+                for shift in self._recent_shifts
+            ))
     
     def generate_final_report(self):
         """Generate and display final momentum shift report"""
-        all_momentum_changes = []
-        
         # Calculate percentage changes for all stocks
         prices = self.fetch_all_live_prices()
+        now = time.time()
+        current_ltp, fetched = self._prices_to_array(prices)
+        rows, pct_change = self.calculate_percentage_changes(current_ltp, fetched, now)
         
-        for symbol, price_data in prices.items():
-            current_ltp = price_data['ltp']
-            changes = self.calculate_percentage_change(symbol, current_ltp)
-            all_momentum_changes.extend(changes)
-        
-        if not all_momentum_changes:
+        if not rows.size:
             logger.warning("No momentum shifts detected in the analysis period.")
             return
         
-        # Sort by absolute percentage change
-        sorted_changes = sorted(all_momentum_changes, key=lambda x: x['abs_pct_change'], reverse=True)
-        
         # Separate upward and downward shifts
-        upward_shifts = [s for s in sorted_changes if s['shift_type'] == 'Upward']
-        downward_shifts = [s for s in sorted_changes if s['shift_type'] == 'Downward']
+        upward_shifts = self._top_shifts(rows, pct_change, 1, current_ltp, now)
+        downward_shifts = self._top_shifts(rows, pct_change, -1, current_ltp, now)
         
         # Display results
         print("\n" + "="*100)
@@ -303,43 +559,42 @@ class IntradayMomentumAnalyzer:
         print("="*100)
         
         print("\n" + "-"*100)
-        print("TOP 5 UPWARD MOMENTUM SHIFTS")
+        print(f"TOP {TOP_N_STOCKS} UPWARD MOMENTUM SHIFTS")
         print("-"*100)
         
-        if upward_shifts:
-            df_up = pd.DataFrame(upward_shifts[:5])
-            df_up['shift_time'] = df_up['shift_time'].apply(lambda x: x.strftime('%H:%M:%S'))
-            df_up['time_since_shift_mins'] = df_up['time_since_shift_mins'].apply(lambda x: f"{x:.1f}")
-            df_up['pct_change'] = df_up['pct_change'].apply(lambda x: f"{x:.2f}%")
-            df_up['price_at_cross'] = df_up['price_at_cross'].apply(lambda x: f"₹{x:.2f}")
-            df_up['current_price'] = df_up['current_price'].apply(lambda x: f"₹{x:.2f}")
-            
-            print(df_up[['symbol', 'shift_time', 'shift_type', 'price_at_cross', 
-                         'current_price', 'pct_change', 'time_since_shift_mins']].to_string(index=False))
-        else:
-            print("No upward momentum shifts detected.")
+        self._print_shift_table(upward_shifts, "No upward momentum shifts detected.")
         
         print("\n" + "-"*100)
-        print("TOP 5 DOWNWARD MOMENTUM SHIFTS")
+        print(f"TOP {TOP_N_STOCKS} DOWNWARD MOMENTUM SHIFTS")
         print("-"*100)
         
-        if downward_shifts:
-            df_down = pd.DataFrame(downward_shifts[:5])
-            df_down['shift_time'] = df_down['shift_time'].apply(lambda x: x.strftime('%H:%M:%S'))
-            df_down['time_since_shift_mins'] = df_down['time_since_shift_mins'].apply(lambda x: f"{x:.1f}")
-            df_down['pct_change'] = df_down['pct_change'].apply(lambda x: f"{x:.2f}%")
-            df_down['price_at_cross'] = df_down['price_at_cross'].apply(lambda x: f"₹{x:.2f}")
-            df_down['current_price'] = df_down['current_price'].apply(lambda x: f"₹{x:.2f}")
-            
-            print(df_down[['symbol', 'shift_time', 'shift_type', 'price_at_cross',
-                          'current_price', 'pct_change', 'time_since_shift_mins']].to_string(index=False))
-        else:
-            print("No downward momentum shifts detected.")
+        self._print_shift_table(downward_shifts, "No downward momentum shifts detected.")
         
         print("\n" + "="*100)
         
         # Save to files
-        self._save_results(upward_shifts[:5], downward_shifts[:5])
+        self._save_results(upward_shifts, downward_shifts)
+    
+    def _print_shift_table(self, shifts: List[Dict], empty_message: str):
+        """Print momentum shifts as a fixed-width table"""
+        if not shifts:
+            print(empty_message)
+            return
+        
+        row_format = "{:<12} {:>10} {:>10} {:>14} {:>13} {:>10} {:>21}"
+        print(row_format.format('symbol', 'shift_time', 'shift_type', 'price_at_cross',
+                                'current_price', 'pct_change', 'time_since_shift_mins'))
+        
+        for shift in shifts:
+            print(row_format.format(
+                shift['symbol'],
+                shift['shift_time'].strftime('%H:%M:%S'),
+                shift['shift_type'],
+                f"₹{shift['price_at_cross']:.2f}",
+                f"₹{shift['current_price']:.2f}",
+                f"{shift['pct_change']:.2f}%",
+                f"{shift['time_since_shift_mins']:.1f}"
+            ))
     
     def _save_results(self, upward: List[Dict], downward: List[Dict]):
         """Save results to JSON and CSV"""
@@ -352,19 +607,21 @@ class IntradayMomentumAnalyzer:
             }
             
             # Save to JSON
-            with open('momentum_analysis_results.json', 'w') as f:
-                json.dump(results, f, indent=2, default=str)
+            with open('momentum_analysis_results.json', 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY, default=str))
             
             # Save to CSV
             all_shifts = upward + downward
             if all_shifts:
-                df = pd.DataFrame(all_shifts)
-                df.to_csv('momentum_analysis_results.csv', index=False)
+                with open('momentum_analysis_results.csv', 'w', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=list(all_shifts[0].keys()))
+                    writer.writeheader()
+                    writer.writerows(all_shifts)
             
             logger.info("Results saved to momentum_analysis_results.json and .csv")
             
         except Exception as e:
-            logger.error(f"Error saving results: {e}")
+            logger.error("Error saving results: %s", e)
 
 
 def main():
@@ -0,0 +1,191 @@
+"""
+NSE India HTTP client
+Session setup, cookie warm-up and concurrent quote fetching shared by the scraper, the analyzer
+and the connection test
+"""
+
+import asyncio
+import logging
+import orjson
+import requests
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession, DO_NOT_CACHE
+from urllib3.util.retry import Retry
+
+from config import (MAX_RETRIES, RETRY_DELAY_SECONDS, NSE_BASE_URL, NSE_QUOTE_API, NSE_MARKET_PAGE,
+                    HTTP_HEADERS, NSE_CACHE_NAME, CONSTITUENTS_CACHE_SECONDS, QUOTE_CACHE_SECONDS)
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+logger = logging.getLogger(__name__)
+
+# requests, aiohttp and httpx all decode br through brotli/brotlicffi, so only advertise it when one is installed
+HEADERS = HTTP_HEADERS if brotli is not None else {**HTTP_HEADERS, 'Accept-Encoding': 'gzip, deflate'}
+
+# Cookies NSE expects on API requests
+_SESSION_COOKIES = frozenset({'nsit', 'nseappid'})
+
+# Aggregate rows the index endpoint returns alongside the constituents
+NON_STOCK_SYMBOLS = frozenset({'NIFTY 50', 'NIFTY 50 P/E', 'NIFTY 50 P/B'})
+
+_shared_session = None
+
+
+def quote_url(symbol: str) -> str:
+    """Return the quote-equity API URL for one symbol, encoded so symbols like M&M stay one query value"""
+    return NSE_QUOTE_API.format(symbol=quote(symbol, safe=''))
+
+
+def _is_cacheable(response: requests.Response) -> bool:
+    """
+    Keep NSE's empty or bot-block pages out of the cache; they are often sent with status 200
+    Also applied to cache reads, so an entry stored before this check is dropped instead of reused
+    """
+    if '/api/' not in response.url:
+        return True
+    
+    try:
+        data = orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        return False
+    
+    if 'equity-stockIndices' in response.url:
+        return isinstance(data, dict) and bool(data.get('data'))
+    return bool(data)
+
+
+def build_session(cached: bool = False) -> requests.Session:
+    """
+    Create an NSE session with pooled keep-alive connections and retry/backoff
+    Args:
+        cached: Cache the constituent and quote API responses on disk (never use for live prices)
+    """
+    if cached:
+        # On-disk cache for the API endpoints only; the homepage is never cached so its cookies stay fresh
+        session = CachedSession(
+            NSE_CACHE_NAME,
+            backend='sqlite',
+            expire_after=DO_NOT_CACHE,
+            filter_fn=_is_cacheable,
+            urls_expire_after={
+                'www.nseindia.com/api/equity-stockIndices': CONSTITUENTS_CACHE_SECONDS,
+                'www.nseindia.com/api/quote-equity': QUOTE_CACHE_SECONDS
+            }
+        )
+        session.cache.delete(expired=True)
+    else:
+        session = requests.Session()
+    
+    # Pooled keep-alive connections with retry/backoff on transient NSE errors
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=MAX_RETRIES,
+            backoff_factor=RETRY_DELAY_SECONDS,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False
+        )
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> CachedSession:
+    """
+    Return the process-wide cached NSE session, creating it on first use
+    Shared by every Nifty50Scraper and test_connection so they reuse one connection pool and cookie jar
+    """
+    global _shared_session
+    if _shared_session is None:
+        _shared_session = build_session(cached=True)
+    return _shared_session
+
+
+def has_session_cookies(session: requests.Session) -> bool:
+    """Check whether the cookies NSE requires for API calls are in the session"""
+    return _SESSION_COOKIES.issubset(session.cookies.keys())
+
+
+def warmup(session: requests.Session, headers: dict = HEADERS) -> bool:
+    """Initialize session by visiting the NSE homepage and market page to get cookies"""
+    try:
+        logger.info("Initializing session with NSE...")
+        session.get(NSE_BASE_URL, headers=headers, timeout=10)
+        
+        # The API often answers 401/empty unless the page named in the Referer was visited first
+        session.get(NSE_MARKET_PAGE, headers=headers, timeout=10)
+        
+        # Cookies are stored as soon as each response arrives, so check instead of sleeping
+        if not has_session_cookies(session):
+            logger.warning("NSE session cookies %s not all set after warm-up; API calls may be rejected",
+                           ', '.join(sorted(_SESSION_COOKIES)))
+        return True
+    except Exception as e:
+        logger.error("Failed to initialize session: %s", e)
+        return False
+
+
+def _open_quote_client(headers: dict, cookies: Dict[str, str], http2: bool):
+    """Create the async client for per-symbol quotes"""
+    # Imported here so callers that never fetch quotes don't pay the import cost
+    if http2:
+        import httpx
+        
+        # A single HTTP/2 connection multiplexes all in-flight quote requests
+        return httpx.AsyncClient(http2=True, headers=headers, cookies=cookies, timeout=10.0,
+                                 limits=httpx.Limits(max_connections=20, max_keepalive_connections=20))
+    
+    import aiohttp
+    
+    connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=10)
+    return aiohttp.ClientSession(headers=headers, cookies=cookies, connector=connector, timeout=timeout)
+
+
+async def _fetch_quote(client, semaphore: asyncio.Semaphore, symbol: str, http2: bool) -> Tuple[str, Dict]:
+    """GET the quote-equity payload for one symbol on either client, None on failure"""
+    url = quote_url(symbol)
+    try:
+        async with semaphore:
+            if http2:
+                response = await client.get(url)
+                status, body = response.status_code, response.content
+            else:
+                async with client.get(url) as response:
+                    status, body = response.status, await response.read()
+        
+        if status != 200:
+            logger.debug("Quote for %s returned status code: %s", symbol, status)
+            return symbol, None
+        return symbol, orjson.loads(body)
+    except Exception as e:
+        logger.debug("Error fetching quote for %s: %s", symbol, e)
+        return symbol, None
+
+
+async def fetch_quotes(session: requests.Session, symbols: List[str], headers: dict = HEADERS,
+                       http2: bool = False) -> Dict[str, Dict]:
+    """
+    Fetch quote-equity payloads for many symbols concurrently, reusing the NSE cookies of a warmed-up session
+    Args:
+        http2: Multiplex the requests over HTTP/2 with httpx instead of aiohttp (requires httpx[http2])
+    Returns dictionary of symbol -> quote-equity payload for the symbols that succeeded
+    """
+    semaphore = asyncio.Semaphore(10)
+    
+    # The client is scoped to this call because asyncio.run() gives every call a fresh event loop
+    async with _open_quote_client(headers, session.cookies.get_dict(), http2) as client:
+        results = await asyncio.gather(*[_fetch_quote(client, semaphore, symbol, http2) for symbol in symbols])
+    
+    return {symbol: data for symbol, data in results if data is not None}
@@ -3,125 +3,184 @@ NIFTY 50 Stock Scraper
 Fetches the list of NIFTY 50 stocks with their ISINs from NSE India website
 """
 
+import asyncio
+import csv
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import json
-import time
-from typing import List, Dict
+import orjson
+from typing import List, Dict, NamedTuple
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import NSE_BASE_URL, NSE_NIFTY50_API
+from nse_client import HEADERS, NON_STOCK_SYMBOLS, fetch_quotes, get_session, has_session_cookies, quote_url, warmup
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Shared read-only stand-in for a missing 'meta' block, instead of a fresh {} per stock
+_EMPTY_META = {}
+
+
+class Stock(NamedTuple):
+    """One NIFTY 50 constituent; converted to a dict only when written to JSON"""
+    symbol: str
+    isin: str
+    company_name: str
+    last_price: float = 0.0
+    change: float = 0.0
+    pChange: float = 0.0
+
 
 class Nifty50Scraper:
+    __slots__ = ('base_url', 'nifty50_url', 'headers', 'session')
+    
     def __init__(self):
-        self.base_url = "https://www.nseindia.com"
-        self.nifty50_url = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'application/json, text/plain, */*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Referer': 'https://www.nseindia.com/market-data/live-equity-market'
-        }
-        self.session = requests.Session()
+        self.base_url = NSE_BASE_URL
+        self.nifty50_url = NSE_NIFTY50_API
+        self.headers = HEADERS
         
-    def _init_session(self):
-        """Initialize session by visiting NSE homepage to get cookies"""
-        try:
-            logger.info("Initializing session with NSE...")
-            self.session.get(self.base_url, headers=self.headers, timeout=10)
-            time.sleep(2)
-            return True
-        except Exception as e:
-            logger.error(f"Failed to initialize session: {e}")
-            return False
-    
-    def fetch_nifty50_stocks(self) -> List[Dict]:
+        self.session = get_session()
+        
+    def fetch_nifty50_stocks(self) -> List[Stock]:
         """
         Fetch NIFTY 50 stocks from NSE API
-        Returns list of dictionaries with stock details
+        Returns list of Stock records with stock details
         """
         try:
-            if not self._init_session():
-                raise Exception("Failed to initialize session")
+            # A cached constituent list needs no cookie warm-up; the cache answers 504 when it has none
+            response = self.session.get(self.nifty50_url, headers=self.headers, only_if_cached=True)
             
-            logger.info("Fetching NIFTY 50 stocks...")
-            response = self.session.get(self.nifty50_url, headers=self.headers, timeout=15)
+            if response.status_code == 504:
+                if not warmup(self.session, self.headers):
+                    raise Exception("Failed to initialize session")
+                
+                logger.info("Fetching NIFTY 50 stocks...")
+                response = self.session.get(self.nifty50_url, headers=self.headers, timeout=15)
+            else:
+                logger.info("Using cached NIFTY 50 stocks")
             
             if response.status_code != 200:
                 raise Exception(f"Failed to fetch data. Status code: {response.status_code}")
             
-            data = response.json()
-            stocks = []
+            data = orjson.loads(response.content)
+            stocks = [
+                Stock(
+                    stock['symbol'],
+                    meta.get('isin', 'NA'),
+                    meta.get('companyName', stock['symbol']),
+                    stock.get('lastPrice', 0),
+                    stock.get('change', 0),
+                    stock.get('pChange', 0)
+                )
+                for stock in data.get('data', ())
+                if stock.get('symbol') and stock['symbol'] not in NON_STOCK_SYMBOLS
+                for meta in (stock.get('meta') or _EMPTY_META,)
+            ]
             
-            if 'data' in data:
-                for stock in data['data']:
-                    if stock.get('symbol') and stock['symbol'] != 'NIFTY 50':
-                        stock_info = {
-                            'symbol': stock.get('symbol', ''),
-                            'isin': stock.get('meta', {}).get('isin', 'NA'),
-                            'company_name': stock.get('meta', {}).get('companyName', stock.get('symbol', '')),
-                            'last_price': stock.get('lastPrice', 0),
-                            'change': stock.get('change', 0),
-                            'pChange': stock.get('pChange', 0)
-                        }
-                        stocks.append(stock_info)
-            
-            logger.info(f"Successfully fetched {len(stocks)} NIFTY 50 stocks")
+            logger.info("Successfully fetched %d NIFTY 50 stocks", len(stocks))
             return stocks
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Network error while fetching NIFTY 50 stocks: {e}")
+            logger.error("Network error while fetching NIFTY 50 stocks: %s", e)
             return []
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
+        except orjson.JSONDecodeError as e:
+            logger.error("Failed to parse JSON response: %s", e)
             return []
         except Exception as e:
-            logger.error(f"Error fetching NIFTY 50 stocks: {e}")
+            logger.error("Error fetching NIFTY 50 stocks: %s", e)
             return []
     
-    def save_to_json(self, stocks: List[Dict], filename: str = 'nifty50_stocks.json'):
-        """Save stocks data to JSON file"""
-        try:
-            with open(filename, 'w') as f:
-                json.dump(stocks, f, indent=2)
-            logger.info(f"Saved {len(stocks)} stocks to {filename}")
-        except Exception as e:
-            logger.error(f"Error saving to JSON: {e}")
+    async def fetch_quotes_async(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch quotes for many symbols concurrently on one event loop
+        Returns dictionary of symbol -> quote-equity payload for the symbols that succeeded
+        """
+        # The quote API needs the NSE cookies from the homepage visit, which runs off the event loop
+        if not has_session_cookies(self.session):
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, warmup, self.session, self.headers):
+                return {}
+        
+        quotes = await fetch_quotes(self.session, symbols, self.headers)
+        logger.info("Fetched quotes for %d of %d stocks", len(quotes), len(symbols))
+        return quotes
+    
+    def _fetch_one_quote(self, symbol: str) -> Dict:
+        """Fetch the quote-equity payload for one symbol on the shared session"""
+        response = self.session.get(quote_url(symbol), headers=self.headers, timeout=10)
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    def fetch_quotes_batch(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch quotes for many symbols concurrently from synchronous code
+        Returns dictionary of symbol -> quote-equity payload for the symbols that succeeded
+        """
+        if not has_session_cookies(self.session) and not warmup(self.session, self.headers):
+            return {}
+        
+        quotes = {}
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = {executor.submit(self._fetch_one_quote, symbol): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    quotes[symbol] = future.result()
+                except Exception as e:
+                    logger.error("Error fetching quote for %s: %s", symbol, e)
+        
+        logger.info("Fetched quotes for %d of %d stocks", len(quotes), len(symbols))
+        return quotes
     
-    def save_to_csv(self, stocks: List[Dict], filename: str = 'nifty50_stocks.csv'):
-        """Save stocks data to CSV file"""
+    def save_all(self, stocks: List[Stock], base: str = 'nifty50_stocks'):
+        """Save stocks data to {base}.json and {base}.csv in a single pass over the rows"""
+        if not stocks:
+            return
+        
         try:
-            df = pd.DataFrame(stocks)
-            df.to_csv(filename, index=False)
-            logger.info(f"Saved {len(stocks)} stocks to {filename}")
+            with open(f'{base}.json', 'wb') as json_file, open(f'{base}.csv', 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(Stock._fields)
+                
+                rows = []
+                for stock in stocks:
+                    writer.writerow(stock)
+                    rows.append(stock._asdict())
+                
+                json_file.write(orjson.dumps(rows, option=orjson.OPT_INDENT_2))
+            logger.info("Saved %d stocks to %s.json and %s.csv", len(stocks), base, base)
         except Exception as e:
-            logger.error(f"Error saving to CSV: {e}")
+            logger.error("Error saving stocks: %s", e)
 
 
-def main():
+async def main_async():
     scraper = Nifty50Scraper()
-    stocks = scraper.fetch_nifty50_stocks()
+    loop = asyncio.get_running_loop()
+    stocks = await loop.run_in_executor(None, scraper.fetch_nifty50_stocks)
     
     if stocks:
-        scraper.save_to_json(stocks)
-        scraper.save_to_csv(stocks)
+        # Write the files on a worker thread while the table is printed
+        saving = loop.run_in_executor(None, scraper.save_all, stocks)
         
         print("\n" + "="*80)
         print("NIFTY 50 STOCKS FETCHED SUCCESSFULLY")
         print("="*80)
         print(f"\nTotal stocks: {len(stocks)}\n")
         
-        df = pd.DataFrame(stocks)
-        print(df[['symbol', 'isin', 'company_name']].to_string(index=False))
+        row_format = "{:<12} {:<12} {}"
+        print(row_format.format('symbol', 'isin', 'company_name'))
+        for stock in stocks:
+            print(row_format.format(stock.symbol, stock.isin, stock.company_name))
         print("\n" + "="*80)
+        
+        await saving
     else:
         print("Failed to fetch NIFTY 50 stocks. Please check logs.")
 
 
+def main():
+    asyncio.run(main_async())
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
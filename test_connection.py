@@ -2,65 +2,64 @@
 Test script to verify NSE India connection and data availability
 """
 
-import requests
-import time
-import json
+import orjson
 from datetime import datetime
 
+from config import NSE_BASE_URL, NSE_NIFTY50_API, NSE_MARKET_PAGE
+from nse_client import HEADERS, NON_STOCK_SYMBOLS, get_session, quote_url
+
+# Market hours as minutes since midnight: 9:15 AM open, closed from 3:30 PM
+MARKET_OPEN_MINUTE = 9 * 60 + 15
+MARKET_CLOSE_MINUTE = 15 * 60 + 30
+
+
 def test_nse_connection():
     """Test basic connection to NSE India"""
     print("="*60)
     print("NSE India Connection Test")
     print("="*60)
     
-    base_url = "https://www.nseindia.com"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Accept': 'application/json, text/plain, */*',
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Connection': 'keep-alive',
-        'Referer': 'https://www.nseindia.com/market-data/live-equity-market'
-    }
+    headers = HEADERS
     
-    session = requests.Session()
+    # Same pooled session and cookie jar as the scraper
+    session = get_session()
     
     # Test 1: Homepage access
     print("\n1. Testing homepage access...")
     try:
-        response = session.get(base_url, headers=headers, timeout=10)
+        response = session.get(NSE_BASE_URL, headers=headers, timeout=10)
         if response.status_code == 200:
             print("   ✓ Homepage accessible")
         else:
             print(f"   ✗ Homepage returned status code: {response.status_code}")
+        
+        # Visit the page named in the Referer, as the scraper's warm-up does, so the API accepts the session
+        session.get(NSE_MARKET_PAGE, headers=headers, timeout=10)
     except Exception as e:
         print(f"   ✗ Error: {e}")
         return False
     
-    time.sleep(2)
-    
     # Test 2: NIFTY 50 API
     print("\n2. Testing NIFTY 50 API...")
     try:
-        url = "https://www.nseindia.com/api/equity-stockIndices?index=NIFTY%2050"
-        response = session.get(url, headers=headers, timeout=15)
+        response = session.get(NSE_NIFTY50_API, headers=headers, timeout=15, force_refresh=True)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if 'data' in data:
-                stock_count = len([s for s in data['data'] if s.get('symbol') != 'NIFTY 50'])
+                stocks = [s for s in data['data'] if s.get('symbol') and s['symbol'] not in NON_STOCK_SYMBOLS]
                 print(f"   ✓ NIFTY 50 API accessible")
-                print(f"   ✓ Retrieved {stock_count} stocks")
+                print(f"   ✓ Retrieved {len(stocks)} stocks")
                 
                 # Display sample data
                 print("\n   Sample stocks:")
-                for i, stock in enumerate(data['data'][:3]):
-                    if stock.get('symbol') != 'NIFTY 50':
-                        print(f"     • {stock.get('symbol')}: ₹{stock.get('lastPrice', 0)}")
+                for stock in stocks[:3]:
+                    print(f"     • {stock.get('symbol')}: ₹{stock.get('lastPrice', 0)}")
             else:
                 print("   ✗ No data in response")
         else:
             print(f"   ✗ API returned status code: {response.status_code}")
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print("   ✗ Failed to parse JSON response")
     except Exception as e:
         print(f"   ✗ Error: {e}")
@@ -69,11 +68,10 @@ def test_nse_connection():
     # Test 3: Individual stock quote
     print("\n3. Testing individual stock quote API...")
     try:
-        url = "https://www.nseindia.com/api/quote-equity?symbol=TCS"
-        response = session.get(url, headers=headers, timeout=10)
+        response = session.get(quote_url('TCS'), headers=headers, timeout=10, force_refresh=True)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             price = data.get('priceInfo', {}).get('lastPrice', 0)
             print(f"   ✓ Stock quote API accessible")
             print(f"   ✓ TCS Last Price: ₹{price}")
@@ -86,13 +84,11 @@ def test_nse_connection():
     print("\n4. Checking market status...")
     try:
         current_time = datetime.now()
-        hour = current_time.hour
-        minute = current_time.minute
-        day = current_time.weekday()
+        minute_of_day = current_time.hour * 60 + current_time.minute
         
         # Market hours: 9:15 AM to 3:30 PM, Monday to Friday
-        if day < 5:  # Monday to Friday
-            if (hour == 9 and minute >= 15) or (9 < hour < 15) or (hour == 15 and minute <= 30):
+        if current_time.weekday() < 5:  # Monday to Friday
+            if MARKET_OPEN_MINUTE <= minute_of_day < MARKET_CLOSE_MINUTE:
                 print("   ✓ Market is currently OPEN")
             else:
                 print("   ⚠ Market is currently CLOSED")